@@ -10,7 +10,6 @@ from omegaconf import DictConfig
 from rich.pretty import pretty_repr
 
 from foxysafe import CONFIG_DIR, CONFIG_NAME
-from foxysafe.gitlab.backups import gitlab_backup_routine
 from foxysafe.utils.custom_logging import disable_logging_groups, setup_custom_hydra_logging
 
 
@@ -23,6 +22,8 @@ def backup_routine_entrypoint(config: DictConfig):
         config (DictConfig): Hydra config object.
     """
 
+    from foxysafe.gitlab.backups import gitlab_backup_routine
+
     setup_custom_hydra_logging(config)
 
     log.info(f"Found {CONFIG_NAME} configuration file in {CONFIG_DIR}")
@@ -40,11 +41,16 @@ def backup_routine_entrypoint(config: DictConfig):
 def main():
     """Entrypoint for foxysafe configured by hydra YAML config file."""
 
+    from rich.traceback import install as rich_traceback_install
+
+    rich_traceback_install()
     disable_logging_groups("urllib3")
 
     try:
-        hydra_working_dir = "./foxysafe_out/${now:%Y-%m-%d}/${now:%H-%M-%S}/"
-        sys.argv += [f"hydra.run.dir={hydra_working_dir}"]
+        # A fixed run dir given by the user updates the backup in it in place, otherwise start a new timestamped one
+        if not any(arg.lstrip("+").startswith("hydra.run.dir=") for arg in sys.argv[1:]):
+            hydra_working_dir = "./foxysafe_out/${now:%Y-%m-%d}/${now:%H-%M-%S}/"
+            sys.argv += [f"hydra.run.dir={hydra_working_dir}"]
 
         backup_routine_entrypoint()
     except KeyboardInterrupt:
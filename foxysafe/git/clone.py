@@ -1,8 +1,9 @@
-import json
 import os
-from multiprocessing import Pool
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 
+import orjson
 from beartype import beartype
 from beartype.typing import Any
 from loguru import logger as log
@@ -10,12 +11,87 @@ from loguru import logger as log
 import git
 from gitlab.v4.objects import Group, Project, Snippet
 
+# Default number of parallel clone workers, leaving two CPUs to the rest of the system
+DEFAULT_JOBS = max(1, (os.cpu_count() or 2) - 2)
+
+
+@lru_cache(maxsize=1)
+def _get_git_version_info() -> tuple[int, ...]:
+    """Get the version of the installed git executable, probed only once per process.
+
+    Returns:
+        tuple[int, ...]: Git version info, e.g. (2, 43, 0).
+    """
+
+    return git.Git().version_info
+
 
 @beartype
-def clone_project(args) -> dict[str, Any]:
+def _get_clone_options(partial_clone: bool = False, single_branch: bool = False, shallow: bool = False) -> list[str]:
+    """Build the additional `git clone` options for the configured clone mode.
+
+    Args:
+        partial_clone (bool, optional): Clone without file blobs, fetching them on demand. Defaults to False.
+        single_branch (bool, optional): Clone only the default branch. Defaults to False.
+        shallow (bool, optional): Clone only the latest commit without tags. Defaults to False.
+
+    Returns:
+        list[str]: Raw `git clone` command line options.
+    """
+
+    multi_options = list()
+    if partial_clone:
+        if _get_git_version_info() >= (2, 27):
+            multi_options.append("--filter=blob:none")
+        else:
+            log.warning("Partial clones require git 2.27 or newer, falling back to full clones.")
+
+    if single_branch:
+        multi_options.append("--single-branch")
+
+    if shallow:
+        multi_options.extend(["--depth=1", "--no-tags"])
+
+    return multi_options
+
+
+@beartype
+def _clone_or_fetch(url: str, target_path: str, multi_options: list[str] | None = None) -> tuple[git.Repo, bool]:
+    """Clone a repository, or update it in place if the target path already holds a clone.
+
+    Args:
+        url (str): URL of the remote repository.
+        target_path (str): Local path of the clone.
+        multi_options (list[str] | None, optional): Additional `git clone` options, also deciding whether an existing
+            shallow clone is fetched shallow and without tags. Defaults to None.
+
+    Returns:
+        git.Repo: The cloned or updated repository.
+        bool: Whether an existing clone has been fetched, so all its branches are already up to date.
+    """
+
+    multi_options = multi_options or list()
+    if (Path(target_path) / ".git").exists():
+        log.info(f"Found existing clone in {target_path}, fetching updates...")
+        fetch_options = ["--all", "--prune"]
+        if "--no-tags" not in multi_options:
+            fetch_options.append("--tags")
+        if "--depth=1" in multi_options:
+            fetch_options.append("--depth=1")
+
+        repository = git.Repo(target_path)
+        repository.git.fetch(*fetch_options)
+        repository.git.reset("--hard", "@{upstream}")
+        return repository, True
+
+    return git.Repo.clone_from(url, target_path, multi_options=multi_options), False
+
+
+@beartype
+def clone_project(
+    project: dict[str, Any], target_path: str, metadata_dir: str, multi_options: list[str] | None = None
+) -> dict[str, Any]:
     """Clone a GitLab project to a local path."""
-    project: Project
-    target_path: str
 
     result = {
         "project_name": "",
@@ -30,79 +106,71 @@ def clone_project(args) -> dict[str, Any]:
         "success": False,
     }
     try:
-        project, target_path = args
-
         result.update(
             {
-                "project_name": project.name,
-                "project_url": project.web_url,
-                "project_id": project.id,
+                "project_name": project["name"],
+                "project_url": project["web_url"],
+                "project_id": project["id"],
                 "project_path": target_path,
             }
         )
-        log.info(f"Cloning project: {project.name} <{project.web_url}> to {target_path}...")
+        log.info(f"Cloning project: {project['name']} <{project['web_url']}> to {target_path}...")
 
         repository = None
         try:
-            repository = git.Repo.clone_from(
-                project.web_url,
-                target_path,
-            )
+            repository, is_fetched = _clone_or_fetch(project["web_url"], target_path, multi_options)
             result["is_cloned"] = True
-            log.info(f"Cloning {project.name} has completed.")
+            log.info(f"Cloning {project['name']} has completed.")
         except Exception as e:
-            log.warning(f"Cloning {project.name} has failed: {e}")
+            log.warning(f"Cloning {project['name']} has failed: {e}")
 
         if repository:
             if repository.submodules:
                 try:
                     result["submodules"] = [submodule.url for submodule in repository.submodules]
-                    log.info("Update submodules...")
-                    are_submodules_updated = len(repository.submodules) * [False]
-                    for ids, submodule in enumerate(repository.submodules):
-                        try:
-                            submodule_path = (Path(target_path) / submodule.path).as_posix()
-                            git.Repo.clone_from(submodule.url, submodule_path, recursive=True)
-                            are_submodules_updated[ids] = True
-                            log.info(f"Cloning submodule {submodule.name} has completed.")
-                        except Exception as e:
-                            log.warning(f"Updating submodules has failed: {e}")
-
-                    repository.submodule_update(recursive=True)
-                    result["is_submodules_cloned"] = all(are_submodules_updated)
-                    log.info("Updated submodules.")
+                    log.info("Updating submodules...")
+                    repository.git.submodule("update", "--init", "--recursive", "--jobs=8")
+                    result["is_submodules_updated"] = all(
+                        submodule.module_exists() for submodule in repository.submodules
+                    )
+                    log.info(f"Updated {len(result['submodules'])} submodules.")
                 except Exception as e:
                     log.warning(f"Updating submodules has failed: {e}")
 
-            remote_branches = repository.git.branch("--all").replace("remotes/", "").split("\n")[2:]
-            remote_branches = [b.strip() for b in remote_branches]
+            remote_branches = [ref.name for ref in repository.remotes.origin.refs if ref.remote_head != "HEAD"]
             log.debug(f"Found {len(remote_branches)} remote branches: {remote_branches}")
             result["branches"] = remote_branches
             if len(remote_branches) > 1:
-                for remote_branch in remote_branches:
-                    try:
-                        local_branch = remote_branch.replace("origin/", "").strip()
-                        remote_branch = remote_branch.strip()
-                        repository.git.branch("--track", local_branch, remote_branch)
-                        log.debug(f"Tracking branch {remote_branch}.")
-                    except Exception:
-                        log.warning(f"Tracking branch {remote_branch} has failed.")
+                with repository.config_writer() as config_writer:
+                    for remote_branch in remote_branches:
+                        try:
+                            local_branch = remote_branch.replace("origin/", "", 1)
+                            if local_branch not in repository.heads:
+                                repository.create_head(local_branch, remote_branch)
+                            elif repository.heads[local_branch] != repository.active_branch:
+                                repository.heads[local_branch].commit = remote_branch
+                            config_writer.set_value(f'branch "{local_branch}"', "remote", "origin")
+                            config_writer.set_value(f'branch "{local_branch}"', "merge", f"refs/heads/{local_branch}")
+                            log.debug(f"Tracking branch {remote_branch}.")
+                        except Exception:
+                            log.warning(f"Tracking branch {remote_branch} has failed.")
 
                 try:
-                    log.info("Pulling all additional branches...")
-                    repository.git.fetch("--all")
-                    repository.git.pull("--all")
+                    if not is_fetched:
+                        log.info("Fetching all additional branches...")
+                        repository.git.fetch("--all", "--tags", "--prune")
 
                     result["is_branches_updated"] = True
                 except Exception as e:
-                    log.warning(f"Pulling all additional branches has failed: {e}")
+                    log.warning(f"Fetching all additional branches has failed: {e}")
 
             else:
-                log.info("No additional branches to pull.")
+                log.info("No additional branches to fetch.")
                 result["is_branches_updated"] = True
 
-            with open(Path(target_path) / f"../project_{project.id}.json", "w", encoding="utf-8") as f:
-                json.dump(project.asdict(), f, indent=4, sort_keys=True)
+            (Path(metadata_dir) / f"project_{project['id']}.json").write_bytes(
+                orjson.dumps(project["attributes"], option=orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2)
+            )
 
             result["success"] = (
                 True
@@ -112,21 +180,16 @@ def clone_project(args) -> dict[str, Any]:
                 else False
             )
 
-    except KeyboardInterrupt:
-        log.warning(f"Cloning {project.name} has been interrupted.")
-        result["success"] = False
     except Exception as e:
-        log.error(f"Cloning {project.name} has failed: {e}")
+        log.error(f"Cloning {project['name']} has failed: {e}")
         result["success"] = False
     finally:
         return result
 
 
 @beartype
-def clone_wiki(args) -> dict[str, Any]:
+def clone_wiki(obj: dict[str, Any], target_path: str, multi_options: list[str] | None = None) -> dict[str, Any]:
     """Clone a GitLab project to a local path."""
-    obj: Group | Project
-    target_path: str
 
     result = {
         "wiki_name": "",
@@ -141,12 +204,11 @@ def clone_wiki(args) -> dict[str, Any]:
         "success": False,
     }
     try:
-        obj, target_path = args
         result.update(
             {
-                "wiki_name": obj.name + " Wiki",
-                "wiki_url": obj.web_url + ".wiki.git",
-                "wiki_id": obj.id,
+                "wiki_name": obj["name"] + " Wiki",
+                "wiki_url": obj["web_url"] + ".wiki.git",
+                "wiki_id": obj["id"],
                 "wiki_path": target_path,
             }
         )
@@ -154,10 +216,7 @@ def clone_wiki(args) -> dict[str, Any]:
 
         repository = None
         try:
-            repository = git.Repo.clone_from(
-                result["wiki_url"],
-                target_path,
-            )
+            repository, is_fetched = _clone_or_fetch(result["wiki_url"], target_path, multi_options)
             result["is_cloned"] = True
             log.info(f"Cloning {result['wiki_name']} has completed.")
         except Exception as e:
@@ -167,47 +226,44 @@ def clone_wiki(args) -> dict[str, Any]:
             if repository.submodules:
                 try:
                     result["submodules"] = [submodule.url for submodule in repository.submodules]
-                    are_submodules_updated = len(repository.submodules) * [False]
-                    for ids, submodule in enumerate(repository.submodules):
-                        try:
-                            submodule_path = (Path(target_path) / submodule.path).as_posix()
-                            git.Repo.clone_from(submodule.url, submodule_path, recursive=True)
-                            are_submodules_updated[ids] = True
-                            log.info(f"Cloning submodule {submodule.name} has completed.")
-                        except Exception as e:
-                            log.warning(f"Updating submodules has failed: {e}")
-
-                    repository.submodule_update(recursive=True)
-                    result["is_submodules_cloned"] = all(are_submodules_updated)
-                    log.info("Updated submodules.")
+                    log.info("Updating submodules...")
+                    repository.git.submodule("update", "--init", "--recursive", "--jobs=8")
+                    result["is_submodules_updated"] = all(
+                        submodule.module_exists() for submodule in repository.submodules
+                    )
+                    log.info(f"Updated {len(result['submodules'])} submodules.")
                 except Exception as e:
                     log.warning(f"Updating submodules has failed: {e}")
 
-            remote_branches = repository.git.branch("--all").replace("remotes/", "").split("\n")[2:]
-            remote_branches = [b.strip() for b in remote_branches]
+            remote_branches = [ref.name for ref in repository.remotes.origin.refs if ref.remote_head != "HEAD"]
             log.debug(f"Found {len(remote_branches)} remote branches: {remote_branches}")
             result["branches"] = remote_branches
             if len(remote_branches) > 1:
-                for remote_branch in remote_branches:
-                    try:
-                        local_branch = remote_branch.replace("origin/", "").strip()
-                        remote_branch = remote_branch.strip()
-                        repository.git.branch("--track", local_branch, remote_branch)
-                        log.debug(f"Tracking branch {remote_branch}.")
-                    except Exception:
-                        log.warning(f"Tracking branch {remote_branch} has failed.")
+                with repository.config_writer() as config_writer:
+                    for remote_branch in remote_branches:
+                        try:
+                            local_branch = remote_branch.replace("origin/", "", 1)
+                            if local_branch not in repository.heads:
+                                repository.create_head(local_branch, remote_branch)
+                            elif repository.heads[local_branch] != repository.active_branch:
+                                repository.heads[local_branch].commit = remote_branch
+                            config_writer.set_value(f'branch "{local_branch}"', "remote", "origin")
+                            config_writer.set_value(f'branch "{local_branch}"', "merge", f"refs/heads/{local_branch}")
+                            log.debug(f"Tracking branch {remote_branch}.")
+                        except Exception:
+                            log.warning(f"Tracking branch {remote_branch} has failed.")
 
                 try:
-                    log.info("Pulling all additional branches...")
-                    repository.git.fetch("--all")
-                    repository.git.pull("--all")
+                    if not is_fetched:
+                        log.info("Fetching all additional branches...")
+                        repository.git.fetch("--all", "--tags", "--prune")
 
                     result["is_branches_updated"] = True
                 except Exception as e:
-                    log.warning(f"Pulling all additional branches has failed: {e}")
+                    log.warning(f"Fetching all additional branches has failed: {e}")
 
             else:
-                log.info("No additional branches to pull.")
+                log.info("No additional branches to fetch.")
                 result["is_branches_updated"] = True
 
             result["success"] = (
@@ -218,9 +274,6 @@ def clone_wiki(args) -> dict[str, Any]:
                 else False
             )
 
-    except KeyboardInterrupt:
-        log.warning(f"Cloning {result['wiki_name']} has been interrupted.")
-        result["success"] = False
     except Exception as e:
         log.error(f"Cloning {result['wiki_name']} has failed: {e}")
         result["success"] = False
@@ -229,10 +282,10 @@ def clone_wiki(args) -> dict[str, Any]:
 
 
 @beartype
-def clone_snippet(args) -> dict[str, Any]:
+def clone_snippet(
+    snippet: dict[str, Any], target_path: str, metadata_dir: str, multi_options: list[str] | None = None
+) -> dict[str, Any]:
     """Clone a GitLab snippet to a local path."""
-    snippet: Snippet
-    target_path: str
 
     result = {
         "snippet_title": "",
@@ -243,123 +296,195 @@ def clone_snippet(args) -> dict[str, Any]:
         "success": False,
     }
     try:
-        snippet, target_path = args
-
         result.update(
             {
-                "snippet_title": snippet.title,
-                "snippet_url": snippet.web_url,
-                "snippet_id": snippet.id,
+                "snippet_title": snippet["title"],
+                "snippet_url": snippet["web_url"],
+                "snippet_id": snippet["id"],
                 "snippet_path": target_path,
             }
         )
-        log.info(f"Cloning snippet: {snippet.id} <{snippet.web_url}> to {target_path}...")
+        log.info(f"Cloning snippet: {snippet['id']} <{snippet['web_url']}> to {target_path}...")
 
         repository = None
         try:
-            repository = git.Repo.clone_from(snippet.web_url.replace("/-/", "/"), target_path)
+            repository, _ = _clone_or_fetch(snippet["web_url"].replace("/-/", "/"), target_path, multi_options)
             result["is_cloned"] = True
-            log.info(f"Cloning {snippet.id} has completed.")
+            log.info(f"Cloning {snippet['id']} has completed.")
         except Exception as e:
-            log.warning(f"Cloning {snippet.id} has failed: {e}")
+            log.warning(f"Cloning {snippet['id']} has failed: {e}")
 
         if repository:
-            with open(Path(target_path) / f"../snippet_{snippet.id}.json", "w", encoding="utf-8") as f:
-                json.dump(snippet.asdict(), f, indent=4, sort_keys=True)
+            (Path(metadata_dir) / f"snippet_{snippet['id']}.json").write_bytes(
+                orjson.dumps(snippet["attributes"], option=orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2)
+            )
 
             result["success"] = True if result["is_cloned"] else False
 
-    except KeyboardInterrupt:
-        log.warning(f"Cloning {snippet.id} has been interrupted.")
-        result["success"] = False
     except Exception as e:
-        log.error(f"Cloning {snippet.id} has failed: {e}")
+        log.error(f"Cloning {snippet['id']} has failed: {e}")
         result["success"] = False
     finally:
         return result
 
 
 @beartype
-def clone_projects(projects: dict[str, Project], backup_dir: Path) -> None:
+def clone_projects(
+    projects: dict[str, Project], backup_dir: Path, jobs: int | None = None, partial_clone: bool = False
+) -> None:
     """Clone GitLab projects to a local path.
 
     Args:
         projects (dict[str, Project]): GitLab projects dictionary.
         backup_dir (Path): Backup directory.
+        jobs (int | None, optional): Number of parallel clone workers. Defaults to CPU count minus two.
+        partial_clone (bool, optional): Clone without file blobs. Defaults to False.
     """
+    multi_options = _get_clone_options(partial_clone)
     mapped_args = list()
     for project in projects.values():
-        mapped_args.append((project, Path(backup_dir / project.path_with_namespace).resolve().as_posix()))
-
-    with Pool(processes=min(1, os.cpu_count() - 2)) as pool:
-        results = pool.map(clone_project, mapped_args)
+        target_path = backup_dir / project.path_with_namespace
+        mapped_args.append(
+            (
+                {"id": project.id, "name": project.name, "web_url": project.web_url, "attributes": project.asdict()},
+                target_path.as_posix(),
+                target_path.parent.as_posix(),
+                multi_options,
+            )
+        )
 
-    success = all(list(map(lambda x: x["success"], results)))
+    with ThreadPoolExecutor(max_workers=jobs or DEFAULT_JOBS) as executor:
+        futures = [executor.submit(clone_project, *args) for args in mapped_args]
+        results = list()
+        try:
+            for future in as_completed(futures):
+                results.append(future.result())
+                log.info(f"Finished {len(results)}/{len(futures)} project clones.")
+        except KeyboardInterrupt:
+            log.warning("Cloning has been interrupted, cancelling all pending project clones...")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    successes, failures = list(), list()
+    for result in results:
+        (successes if result["success"] else failures).append(result["project_name"])
+
+    success = not failures
     log.info(f"Cloning {'has' if success else 'has not'} been completed successfully.")
-    log.info(f"Successful clones: {list(map(lambda x: x['project_name'], filter(lambda x: x['success'], results)))}")
+    log.info(f"Successful clones: {successes}")
     if not success:
-        log.warning(
-            f"Failed clones: {list(map(lambda x: x['project_name'], filter(lambda x: not x['success'], results)))}"
-        )
+        log.warning(f"Failed clones: {failures}")
 
     log.info("See results.json for details.")
-    with open(backup_dir / "results.json", "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=4, sort_keys=True)
+    (backup_dir / "results.json").write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
 
 
 @beartype
-def clone_wikis(obj: dict[str, Group | Project], backup_dir: Path) -> None:
+def clone_wikis(
+    obj: dict[str, Group | Project],
+    backup_dir: Path,
+    jobs: int | None = None,
+    partial_clone: bool = False,
+    shallow: bool = False,
+) -> None:
     """Clone GitLab group or project wiki to a local path.
 
     Args:
         groups (dict[str, Group | Project]): GitLab groups dictionary.
         backup_dir (Path): Backup directory.
+        jobs (int | None, optional): Number of parallel clone workers. Defaults to CPU count minus two.
+        partial_clone (bool, optional): Clone without file blobs. Defaults to False.
+        shallow (bool, optional): Clone only the latest commit without tags. Defaults to False.
     """
+    multi_options = _get_clone_options(partial_clone, single_branch=True, shallow=shallow)
     mapped_args = list()
     for obj in obj.values():
-        mapped_args.append((obj, Path(backup_dir / f"{obj.path_with_namespace}.wiki").resolve().as_posix()))
-
-    with Pool(processes=min(1, os.cpu_count() - 2)) as pool:
-        results = pool.map(clone_wiki, mapped_args)
+        mapped_args.append(
+            (
+                {"id": obj.id, "name": obj.name, "web_url": obj.web_url},
+                (backup_dir / f"{obj.path_with_namespace}.wiki").as_posix(),
+                multi_options,
+            )
+        )
 
-    success = all(list(map(lambda x: x["success"], results)))
+    with ThreadPoolExecutor(max_workers=jobs or DEFAULT_JOBS) as executor:
+        futures = [executor.submit(clone_wiki, *args) for args in mapped_args]
+        results = list()
+        try:
+            for future in as_completed(futures):
+                results.append(future.result())
+                log.info(f"Finished {len(results)}/{len(futures)} wiki clones.")
+        except KeyboardInterrupt:
+            log.warning("Cloning has been interrupted, cancelling all pending wiki clones...")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    successes, failures = list(), list()
+    for result in results:
+        (successes if result["success"] else failures).append(result["wiki_name"])
+
+    success = not failures
     log.info(f"Cloning {'has' if success else 'has not'} been completed successfully.")
-    log.info(f"Successful clones: {list(map(lambda x: x['wiki_name'], filter(lambda x: x['success'], results)))}")
+    log.info(f"Successful clones: {successes}")
     if not success:
-        log.warning(
-            f"Failed clones: {list(map(lambda x: x['wiki_name'], filter(lambda x: not x['success'], results)))}"
-        )
+        log.warning(f"Failed clones: {failures}")
 
     log.info("See results.json for details.")
-    with open(backup_dir / "results.json", "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=4, sort_keys=True)
+    (backup_dir / "results.json").write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
 
 
 @beartype
-def clone_snippets(snippets: dict[int, Snippet], backup_dir: Path) -> None:
+def clone_snippets(
+    snippets: dict[int, Snippet],
+    backup_dir: Path,
+    jobs: int | None = None,
+    partial_clone: bool = False,
+    shallow: bool = False,
+) -> None:
     """Clone GitLab snippets to a local path.
 
     Args:
         snippets (dict[int, Snippet]): GitLab snippets dictionary.
         backup_dir (Path):  Backup directory.
+        jobs (int | None, optional): Number of parallel clone workers. Defaults to CPU count minus two.
+        partial_clone (bool, optional): Clone without file blobs. Defaults to False.
+        shallow (bool, optional): Clone only the latest commit without tags. Defaults to False.
     """
+    multi_options = _get_clone_options(partial_clone, single_branch=True, shallow=shallow)
     mapped_args = list()
     backup_dir = Path(backup_dir / "snippets")
     backup_dir.mkdir(parents=True, exist_ok=True)
     for snippet in snippets.values():
-        mapped_args.append((snippet, Path(backup_dir / f"{snippet.id}").resolve().as_posix()))
-
-    with Pool(processes=min(1, os.cpu_count() - 2)) as pool:
-        results = pool.map(clone_snippet, mapped_args)
+        mapped_args.append(
+            (
+                {"id": snippet.id, "title": snippet.title, "web_url": snippet.web_url, "attributes": snippet.asdict()},
+                (backup_dir / f"{snippet.id}").as_posix(),
+                backup_dir.as_posix(),
+                multi_options,
+            )
+        )
 
-    success = all(list(map(lambda x: x["success"], results)))
+    with ThreadPoolExecutor(max_workers=jobs or DEFAULT_JOBS) as executor:
+        futures = [executor.submit(clone_snippet, *args) for args in mapped_args]
+        results = list()
+        try:
+            for future in as_completed(futures):
+                results.append(future.result())
+                log.info(f"Finished {len(results)}/{len(futures)} snippet clones.")
+        except KeyboardInterrupt:
+            log.warning("Cloning has been interrupted, cancelling all pending snippet clones...")
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    successes, failures = list(), list()
+    for result in results:
+        (successes if result["success"] else failures).append(result["snippet_id"])
+
+    success = not failures
     log.info(f"Cloning {'has' if success else 'has not'} been completed successfully.")
-    log.info(f"Successful clones: {list(map(lambda x: x['snippet_id'], filter(lambda x: x['success'], results)))}")
+    log.info(f"Successful clones: {successes}")
     if not success:
-        log.warning(
-            f"Failed clones: {list(map(lambda x: x['snippet_id'], filter(lambda x: not x['success'], results)))}"
-        )
+        log.warning(f"Failed clones: {failures}")
 
     log.info("See results.json for details.")
-    with open(backup_dir / "results.json", "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=4, sort_keys=True)
+    (backup_dir / "results.json").write_bytes(orjson.dumps(results, option=orjson.OPT_INDENT_2))
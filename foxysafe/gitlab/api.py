@@ -1,11 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
 from beartype import beartype
+from beartype.typing import Any
 from loguru import logger as log
 from rich.pretty import pretty_repr
 from rich.progress import Progress, track
 
 from gitlab import Gitlab
-from gitlab.exceptions import GitlabGetError, GitlabListError
-from gitlab.v4.objects import Group, Issue, Project, ProjectIssue, Snippet
+from gitlab.exceptions import GitlabError, GitlabGetError, GitlabListError
+from gitlab.v4.objects import Group, Issue, Project, ProjectIssue, ProjectIssueNote, Snippet
+
+GRAPHQL_DESCENDANT_GROUPS_QUERY = """
+query ($fullPath: ID!, $after: String) {
+  group(fullPath: $fullPath) {
+    descendantGroups(first: 100, after: $after) {
+      nodes { id name path fullPath webUrl description visibility }
+      pageInfo { hasNextPage endCursor }
+    }
+  }
+}
+"""
+
+GRAPHQL_PROJECTS_WIKI_ENABLED_QUERY = """
+query ($ids: [ID!]) {
+  projects(ids: $ids, first: 100) {
+    nodes { id wikiEnabled }
+  }
+}
+"""
 
 
 @beartype
@@ -66,7 +89,13 @@ def get_gitlab_items(
                 group = api.groups.get(gid)
 
                 if group:
-                    gitlab_groups, gitlab_projects = _recurse_group(api, group, gitlab_groups, gitlab_projects, pbar)
+                    try:
+                        gitlab_groups, gitlab_projects = _graphql_group_tree(api, group, gitlab_groups, gitlab_projects)
+                    except (GitlabError, KeyError, TypeError) as e:
+                        log.warning(f"GraphQL query for group {group.name} [GID {group.id}] failed, using REST: {e}")
+                        gitlab_groups, gitlab_projects = _recurse_group(
+                            api, group, gitlab_groups, gitlab_projects, pbar
+                        )
 
                 pbar.update(task_1, advance=1)
 
@@ -83,7 +112,7 @@ def get_gitlab_items(
                 gitlab_projects.update({project.id: project})
 
     if include_personal_projects:
-        personal_projects = api.users.get(api.user.id).projects.list(all=True)
+        personal_projects = api.users.get(api.user.id).projects.list(all=True, per_page=100)
         for project in track(personal_projects, description="Searching personal projects..."):
             log.info(f"Found user project: {project.name} [PID {project.id}]")
             gitlab_projects.update({project.id: project})
@@ -91,15 +120,25 @@ def get_gitlab_items(
     if include_wikis:
         for group in track(gitlab_groups.values(), description="Searching group wikis..."):
             try:
-                if hasattr(group, "wikis") and (pages := group.wikis.list(all=True)):
+                if hasattr(group, "wikis") and (pages := group.wikis.list(all=True, per_page=100)):
                     log.info(f"Found wiki with {len(pages)} pages for group {group.name} [GID {group.id}]")
                     gitlab_wikis.update({f"G{group.id}": group})
             except GitlabListError:
                 log.warning(f"Failed to get wiki for group {group.name} [GID {group.id}]")
 
+        try:
+            wiki_enabled_project_ids = _graphql_wiki_enabled_project_ids(api, list(gitlab_projects.keys()))
+        except (GitlabError, KeyError, TypeError) as e:
+            log.warning(f"GraphQL query for project wikis failed, using REST: {e}")
+            wiki_enabled_project_ids = set(gitlab_projects.keys())
+
         for project in track(gitlab_projects.values(), description="Searching project wikis..."):
+            if project.id not in wiki_enabled_project_ids:
+                log.debug(f"Wiki is disabled for project {project.name} [PID {project.id}]")
+                continue
+
             try:
-                if hasattr(project, "wikis") and (pages := project.wikis.list(all=True)):
+                if hasattr(project, "wikis") and (pages := project.wikis.list(all=True, per_page=100)):
                     log.info(f"Found wiki with {len(pages)} pages for project {project.name} [PID {project.id}]")
                     gitlab_wikis.update({f"P{project.id}": project})
             except GitlabListError:
@@ -108,14 +147,14 @@ def get_gitlab_items(
     gitlab_issues = dict()
     if include_issues:
         for pid in track(gitlab_projects.keys(), description="Searching issues..."):
-            issues = api.projects.get(pid).issues.list(all=True)
+            issues = api.projects.get(pid, lazy=True).issues.list(all=True, per_page=100)
             for issue in issues:
                 log.info(f"Found issue: {issue.title} [IID {issue.iid}]")
                 gitlab_issues.update({f"{pid}/{issue.iid}": issue})
 
     gitlab_snippets = dict()
     if include_snippets:
-        snippets = api.snippets.list(all=True)
+        snippets = api.snippets.list(all=True, per_page=100)
         for snippet in track(snippets, description="Searching snippets..."):
             log.info(f"Found snippet: {snippet.title} [SID {snippet.id}]")
             gitlab_snippets.update({snippet.id: snippet})
@@ -128,6 +167,37 @@ def get_gitlab_items(
     return gitlab_groups, gitlab_projects, gitlab_wikis, gitlab_issues, gitlab_snippets
 
 
+@beartype
+def get_issue_notes(issue: Issue | ProjectIssue, max_workers: int = 8) -> list[ProjectIssueNote]:
+    """Get all notes of a GitLab issue, fetching all pages after the first one in parallel.
+
+    Args:
+        issue (Issue | ProjectIssue): GitLab issue.
+        max_workers (int, optional): Maximum number of pages fetched in parallel. Defaults to 8.
+
+    Returns:
+        list[ProjectIssueNote]: Notes of the issue.
+    """
+
+    first_page = issue.notes.list(iterator=True, per_page=100)
+    if first_page.total_pages is None:
+        # GitLab omits the pagination headers for large collections, follow the next page links instead
+        return list(first_page)
+
+    per_page = first_page.per_page or 100
+    notes = list(islice(first_page, per_page))
+    if first_page.total_pages > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, first_page.total_pages - 1)) as executor:
+            futures = [
+                executor.submit(issue.notes.list, page=page, per_page=per_page)
+                for page in range(2, first_page.total_pages + 1)
+            ]
+            for future in futures:
+                notes += future.result()
+
+    return notes
+
+
 @beartype
 def _recurse_group(
     api: Gitlab, group: Group, groups: dict[str, Group], projects: dict[str, Project], pbar: Progress
@@ -148,12 +218,12 @@ def _recurse_group(
     log.info(f"Found group: {group.name} [GID {group.id}]")
     groups.update({group.id: group})
 
-    subgroups = group.subgroups.list(all=True)
+    subgroups = group.subgroups.list(all=True, per_page=100)
     if subgroups:
         log.debug(f"Found {len(subgroups)} subgroups in group {group.name} [GID {group.id}]")
         task_11 = pbar.add_task("\tIterating subgroups...", total=len(subgroups))
         for subgroup in subgroups:
-            subgroup = api.groups.get(subgroup.id)
+            subgroup = Group(api.groups, subgroup.attributes)
             groups, projects = _recurse_group(api, subgroup, groups, projects, pbar)
 
             pbar.update(task_11, advance=1)
@@ -162,7 +232,7 @@ def _recurse_group(
     else:
         log.debug("Max group depth reached.")
 
-    group_projects = group.projects.list(all=True)
+    group_projects = group.projects.list(all=True, per_page=100)
     if group_projects:
         log.debug(f"Found {len(group_projects)} in {group.name} [GID {group.id}]")
         task_12 = pbar.add_task("\tIterating group projects...", total=len(group_projects))
@@ -175,3 +245,120 @@ def _recurse_group(
         pbar.remove_task(task_12)
 
     return groups, projects
+
+
+@beartype
+def _graphql_group_tree(
+    api: Gitlab, group: Group, groups: dict[str, Group], projects: dict[str, Project]
+) -> tuple[dict[str, Group], dict[str, Project]]:
+    """Get all GitLab subgroups of a group with paginated GraphQL queries and all its projects with a REST listing.
+
+    Projects are listed with REST so their full attributes end up in the project metadata of the backup.
+
+    Args:
+        api (Gitlab): Logged in GitLab api instance.
+        group (Group): GitLab group to search.
+        groups (list[int]): Gitlab groups dictionary.
+        projects (list[int]): Gitlab projects dictionary.
+
+    Returns:
+        dict[int, Group]: Gitlab groups dictionary.
+        dict[int, Project]: Gitlab projects dictionary.
+    """
+
+    subgroup_nodes = _graphql_group_nodes(api, GRAPHQL_DESCENDANT_GROUPS_QUERY, group.full_path, "descendantGroups")
+    group_projects = group.projects.list(all=True, per_page=100, include_subgroups=True)
+
+    log.info(f"Found group: {group.name} [GID {group.id}]")
+    groups.update({group.id: group})
+
+    for node in subgroup_nodes:
+        subgroup = Group(
+            api.groups,
+            {
+                "id": int(node["id"].rsplit("/", 1)[-1]),
+                "name": node["name"],
+                "path": node["path"],
+                "full_path": node["fullPath"],
+                "web_url": node["webUrl"],
+                "description": node["description"],
+                "visibility": node["visibility"],
+            },
+        )
+        log.info(f"Found group: {subgroup.name} [GID {subgroup.id}]")
+        groups.update({subgroup.id: subgroup})
+
+    for project in group_projects:
+        log.info(f"Found group project: {project.name} [PID {project.id}] in group {group.name} [GID {group.id}]")
+        projects.update({project.id: project})
+
+    return groups, projects
+
+
+@beartype
+def _graphql_group_nodes(api: Gitlab, query: str, full_path: str, connection: str) -> list[dict[str, Any]]:
+    """Collect all nodes of a paginated GraphQL connection of a GitLab group.
+
+    Args:
+        api (Gitlab): Logged in GitLab api instance.
+        query (str): GraphQL query taking `fullPath` and `after` variables.
+        full_path (str): Full path of the GitLab group.
+        connection (str): Name of the paginated connection field of the group.
+
+    Returns:
+        list[dict[str, Any]]: All nodes of the connection.
+    """
+
+    nodes = list()
+    after = None
+    while True:
+        data = _graphql_query(api, query, {"fullPath": full_path, "after": after})
+        page = data["group"][connection]
+        nodes += page["nodes"]
+        if not page["pageInfo"]["hasNextPage"]:
+            return nodes
+
+        after = page["pageInfo"]["endCursor"]
+
+
+@beartype
+def _graphql_wiki_enabled_project_ids(api: Gitlab, project_ids: list[int]) -> set[int]:
+    """Get the ids of all projects with an enabled wiki, querying GraphQL in batches of 100 projects.
+
+    Args:
+        api (Gitlab): Logged in GitLab api instance.
+        project_ids (list[int]): List of GitLab project ids.
+
+    Returns:
+        set[int]: Ids of the projects with an enabled wiki.
+    """
+
+    wiki_enabled_project_ids = set()
+    for i in range(0, len(project_ids), 100):
+        ids = [f"gid://gitlab/Project/{pid}" for pid in project_ids[i : i + 100]]
+        data = _graphql_query(api, GRAPHQL_PROJECTS_WIKI_ENABLED_QUERY, {"ids": ids})
+        for node in data["projects"]["nodes"]:
+            if node["wikiEnabled"]:
+                wiki_enabled_project_ids.add(int(node["id"].rsplit("/", 1)[-1]))
+
+    return wiki_enabled_project_ids
+
+
+@beartype
+def _graphql_query(api: Gitlab, query: str, variables: dict[str, Any]) -> dict[str, Any]:
+    """Run a query against the GraphQL API of the GitLab instance.
+
+    Args:
+        api (Gitlab): Logged in GitLab api instance.
+        query (str): GraphQL query.
+        variables (dict[str, Any]): Variables of the query.
+
+    Returns:
+        dict[str, Any]: Data of the query response.
+    """
+
+    response = api.http_post(f"{api.url}/api/graphql", post_data={"query": query, "variables": variables})
+    if response.get("errors"):
+        raise GitlabError(response["errors"])
+
+    return response["data"]
@@ -1,18 +1,22 @@
-import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 from pathlib import Path
 
+import httpx
+import orjson
 from beartype import beartype
 from loguru import logger as log
 from omegaconf import DictConfig
 
 from foxysafe.git.clone import clone_projects, clone_snippets, clone_wikis
-from foxysafe.gitlab.api import get_gitlab_items, gitlab_login
+from foxysafe.gitlab.api import get_gitlab_items, get_issue_notes, gitlab_login
 from foxysafe.gitlab.download import (
-    FILE_UPLOAD_PATTERN,
+    FILE_UPLOAD_RE,
     download_file_from_url,
     find_matches,
     get_issue_attachment_urls,
     get_wiki_attachment_urls,
+    gitlab_web_session,
 )
 from gitlab.v4.objects import Group, Issue, Project, ProjectIssue, ProjectIssueNote, Snippet
 
@@ -23,8 +27,12 @@ def gitlab_backup_routine(config: DictConfig, backup_dir: Path) -> None:
 
     gitlab_group_ids = list(config.gitlab_group_ids) if config.gitlab_group_ids else None
     gitlab_project_ids = list(config.gitlab_project_ids) if config.gitlab_project_ids else None
+    jobs = config.get("jobs")
+    partial_clone = config.get("partial_clone", False)
+    shallow_wikis_and_snippets = config.get("shallow_wikis_and_snippets", False)
+    backup_workers = config.get("backup_workers", 8)
 
-    log.info(f"Searching group: {config.gitlab_group_ids}")
+    log.info(f"Searching group: {gitlab_group_ids}")
     groups, projects, wikis, issues, snippets = get_gitlab_items(
         api,
         gitlab_group_ids,
@@ -42,71 +50,155 @@ def gitlab_backup_routine(config: DictConfig, backup_dir: Path) -> None:
     log.info(f"Found a total of {len(snippets)} snippets to backup.")
 
     if projects:
-        clone_projects(projects, backup_dir)
+        clone_projects(projects, backup_dir, jobs, partial_clone)
 
     if wikis:
-        clone_wikis(wikis, backup_dir)
-        for obj in wikis.values():
-            log.info(f"Backing up wiki attachments for {obj.path_with_namespace}...")
-            try:
-                backup_wiki_attachements(config, obj, obj.path_with_namespace, backup_dir)
-            except Exception as e:
-                log.error(f"Failed to backup wiki attachments for {obj.path_with_namespace}:\n{e}")
-
-    if issues:
-        for issue in issues.values():
-            log.info(f"Backing up issue {issue.iid} for {projects[issue.project_id].path_with_namespace}...")
-            try:
-                backup_issue(config, issue, projects[issue.project_id].path_with_namespace, backup_dir)
-                for note in issue.notes.list(all=True):
-                    log.info(f"Backing up issue note {note.id} for {projects[issue.project_id].path_with_namespace}...")
-                    try:
-                        backup_issue(
-                            config,
-                            note,
-                            projects[issue.project_id].path_with_namespace,
-                            backup_dir,
-                            True,
-                            web_url=issue.web_url,
-                        )
-                    except Exception as e:
-                        log.error(f"Failed to backup issue note {note.id}:\n{e}")
-            except Exception as e:
-                log.error(f"Failed to backup issue {issue.iid}:\n{e}")
+        clone_wikis(wikis, backup_dir, jobs, partial_clone, shallow_wikis_and_snippets)
 
     if snippets:
-        clone_snippets(snippets, backup_dir)
-        for snippet in snippets.values():
-            log.info(f"Backing up snippet {snippet.id}...")
-            try:
-                backup_snippet_attachements(config, snippet, backup_dir)
-            except Exception as e:
-                log.error(f"Failed to backup snippet {snippet.id}:\n{e}")
+        clone_snippets(snippets, backup_dir, jobs, partial_clone, shallow_wikis_and_snippets)
+
+    if not (wikis or issues or snippets):
+        return
+
+    try:
+        session = gitlab_web_session(
+            config.gitlab_server,
+            config.gitlab_username,
+            config.gitlab_password,
+            config.gitlab_personal_access_token,
+        )
+    except Exception as e:
+        log.error(f"Login to {config.gitlab_server} has failed, skipping attachment downloads:\n{e}")
+        session = None
+
+    with session or nullcontext():
+        if wikis and session is not None:
+            with ThreadPoolExecutor(max_workers=backup_workers) as executor:
+                try:
+                    futures = dict()
+                    for obj in wikis.values():
+                        log.info(f"Backing up wiki attachments for {obj.path_with_namespace}...")
+                        future = executor.submit(
+                            backup_wiki_attachements, session, obj, obj.path_with_namespace, backup_dir
+                        )
+                        futures[future] = obj
+
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                        except Exception as e:
+                            log.error(
+                                f"Failed to backup wiki attachments for {futures[future].path_with_namespace}:\n{e}"
+                            )
+                except KeyboardInterrupt:
+                    log.warning("Backup has been interrupted, cancelling all pending wiki attachment backups...")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+
+        if issues:
+            with ThreadPoolExecutor(max_workers=backup_workers) as executor:
+                try:
+                    issue_futures = dict()
+                    for issue in issues.values():
+                        pwn = projects[issue.project_id].path_with_namespace
+                        log.info(f"Backing up issue {issue.iid} for {pwn}...")
+                        future = executor.submit(_backup_issue_and_list_notes, session, issue, pwn, backup_dir)
+                        issue_futures[future] = issue
+
+                    note_futures = dict()
+                    for future in as_completed(issue_futures):
+                        issue = issue_futures[future]
+                        try:
+                            notes = future.result()
+                        except Exception as e:
+                            log.error(f"Failed to backup issue {issue.iid}:\n{e}")
+                            continue
+
+                        pwn = projects[issue.project_id].path_with_namespace
+                        web_url = issue.web_url
+                        for note in notes:
+                            log.info(f"Backing up issue note {note.id} for {pwn}...")
+                            future = executor.submit(
+                                backup_issue, session, note, pwn, backup_dir, True, web_url=web_url
+                            )
+                            note_futures[future] = note
+
+                    for future in as_completed(note_futures):
+                        try:
+                            future.result()
+                        except Exception as e:
+                            log.error(f"Failed to backup issue note {note_futures[future].id}:\n{e}")
+                except KeyboardInterrupt:
+                    log.warning("Backup has been interrupted, cancelling all pending issue backups...")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+
+        if snippets:
+            with ThreadPoolExecutor(max_workers=backup_workers) as executor:
+                try:
+                    futures = dict()
+                    for snippet in snippets.values():
+                        log.info(f"Backing up snippet {snippet.id}...")
+                        future = executor.submit(backup_snippet_attachements, config, session, snippet, backup_dir)
+                        futures[future] = snippet
+
+                    for future in as_completed(futures):
+                        try:
+                            future.result()
+                        except Exception as e:
+                            log.error(f"Failed to backup snippet {futures[future].id}:\n{e}")
+                except KeyboardInterrupt:
+                    log.warning("Backup has been interrupted, cancelling all pending snippet backups...")
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+
+
+@beartype
+def _backup_issue_and_list_notes(
+    session: httpx.Client | None,
+    issue: Issue | ProjectIssue,
+    path_with_namespace: str,
+    backup_dir: Path,
+) -> list[ProjectIssueNote]:
+    """Backup a GitLab issue and list its notes, so they can be backed up in parallel afterwards.
+
+    Args:
+        session (httpx.Client | None): Authenticated client to download attachments with, skipped if None.
+        issue (Issue | ProjectIssue): The issue object to backup.
+        path_with_namespace (str): The path with namespace of the project the issue belongs to.
+        backup_dir (Path): The directory to save the backup to.
+
+    Returns:
+        list[ProjectIssueNote]: The notes of the issue.
+    """
+
+    backup_issue(session, issue, path_with_namespace, backup_dir)
+
+    return get_issue_notes(issue)
 
 
 @beartype
 def backup_wiki_attachements(
-    config: DictConfig, obj: Group | Project, path_with_namespace: str, backup_dir: Path
+    session: httpx.Client, obj: Group | Project, path_with_namespace: str, backup_dir: Path
 ) -> None:
     """Backup a GitLab wiki attachments.
 
     Args:
-        config (DictConfig): Configuration settings.
+        session (httpx.Client): Authenticated client to download attachments with.
         obj (Group | Project): The object to backup.
         path_with_namespace (str): The path with namespace of the project the object belongs to.
         backup_dir (Path): The directory to save the backup to.
     """
 
-    download_dir = (Path(backup_dir / path_with_namespace) / ".wiki/attachements/").resolve()
+    download_dir = backup_dir / path_with_namespace / ".wiki/attachements/"
     download_dir.mkdir(parents=True, exist_ok=True)
 
-    file_urls = get_wiki_attachment_urls(obj, pattern=FILE_UPLOAD_PATTERN)
+    file_urls = get_wiki_attachment_urls(obj, pattern=FILE_UPLOAD_RE)
     if file_urls:
         log.info(f"\t\t\tDownloading attachments:\n{file_urls}")
         download_file_from_url(
-            server=config.gitlab_server,
-            username=config.gitlab_username,
-            password=config.gitlab_password,
+            session=session,
             file_urls=file_urls,
             download_dir=download_dir.as_posix(),
         )
@@ -114,7 +206,7 @@ def backup_wiki_attachements(
 
 @beartype
 def backup_issue(
-    config: DictConfig,
+    session: httpx.Client | None,
     obj: Issue | ProjectIssue | ProjectIssueNote,
     path_with_namespace: str,
     backup_dir: Path,
@@ -124,70 +216,68 @@ def backup_issue(
     """Backup a GitLab issue and its attachments.
 
     Args:
-        config (DictConfig): Configuration settings.
+        session (httpx.Client | None): Authenticated client to download attachments with, skipped if None.
         issue (Issue): The issue object to backup.
         path_with_namespace (str): The path with namespace of the project the issue belongs to.
         backup_dir (Path): The directory to save the backup to.
     """
 
     if is_note:
-        download_dir = (Path(backup_dir / path_with_namespace) / f"issues/{obj.issue_iid}/notes/{obj.id}/").resolve()
-        json_path = (download_dir / f"{obj.id}.json").resolve()
-        md_path = (download_dir / f"{obj.id}.md").resolve()
+        download_dir = backup_dir / path_with_namespace / f"issues/{obj.issue_iid}/notes/{obj.id}/"
+        json_path = download_dir / f"{obj.id}.json"
+        md_path = download_dir / f"{obj.id}.md"
     else:
-        download_dir = (Path(backup_dir / path_with_namespace) / f"issues/{obj.iid}/").resolve()
-        json_path = (download_dir / f"{obj.iid}.json").resolve()
-        md_path = (download_dir / f"{obj.iid}.md").resolve()
+        download_dir = backup_dir / path_with_namespace / f"issues/{obj.iid}/"
+        json_path = download_dir / f"{obj.iid}.json"
+        md_path = download_dir / f"{obj.iid}.md"
 
     json_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(json_path, "w") as f:
-        json.dump(obj.attributes, f, sort_keys=True, indent=4)
-
-    with open(md_path, "w", encoding="utf-8") as f:
-        content = (
-            obj.description.replace("/uploads/", "uploads/")
-            if not is_note
-            else obj.body.replace("/uploads/", "uploads/")
-        )
-        f.write(content)
+    json_path.write_bytes(orjson.dumps(obj.attributes, option=orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2))
 
-    file_urls = get_issue_attachment_urls(obj, pattern=FILE_UPLOAD_PATTERN, is_note=is_note, web_url=web_url)
+    content = obj.body if is_note else obj.description
+    md_path.write_text(content.replace("/uploads/", "uploads/"), encoding="utf-8")
+
+    if session is None:
+        return
+
+    file_urls = get_issue_attachment_urls(obj, pattern=FILE_UPLOAD_RE, is_note=is_note, web_url=web_url)
     if file_urls:
         log.info(f"\t\t\tDownloading attachments:\n{file_urls}")
         download_file_from_url(
-            server=config.gitlab_server,
-            username=config.gitlab_username,
-            password=config.gitlab_password,
+            session=session,
             file_urls=file_urls,
             download_dir=download_dir.as_posix(),
         )
 
 
 @beartype
-def backup_snippet_attachements(config: DictConfig, snippet: Snippet, backup_dir: Path) -> None:
+def backup_snippet_attachements(
+    config: DictConfig, session: httpx.Client | None, snippet: Snippet, backup_dir: Path
+) -> None:
     """Backup a GitLab issue and its attachments.
 
     Args:
         config (DictConfig): Configuration settings.
+        session (httpx.Client | None): Authenticated client to download attachments with, skipped if None.
         snippet (Snippet): The snippet object to backup.
         path_with_namespace (str): The path with namespace of the project the snippet belongs to.
         backup_dir (Path): The directory to save the backup to.
     """
 
-    download_dir = (Path(backup_dir) / f"snippets/{snippet.id}/").resolve()
+    download_dir = backup_dir / f"snippets/{snippet.id}/"
     download_dir.mkdir(parents=True, exist_ok=True)
 
     snippet_path = download_dir / f"snippet_{snippet.id}.md"
-    with open(snippet_path, "w", encoding="utf-8") as f:
-        f.write(snippet.description.replace("/uploads/", "uploads/"))
+    snippet_path.write_text(snippet.description.replace("/uploads/", "uploads/"), encoding="utf-8")
+
+    if session is None:
+        return
 
-    file_urls = find_matches(snippet.description, pattern=FILE_UPLOAD_PATTERN)
+    file_urls = find_matches(snippet.description, pattern=FILE_UPLOAD_RE) if "uploads/" in snippet.description else []
     if file_urls:
         log.info(f"\t\t\tDownloading attachments:\n{file_urls}")
         download_file_from_url(
-            server=config.gitlab_server,
-            username=config.gitlab_username,
-            password=config.gitlab_password,
+            session=session,
             file_urls=[f"{config.gitlab_server}/{url}" for url in file_urls],
             download_dir=download_dir.as_posix(),
         )
@@ -1,143 +1,300 @@
 import json
 import os
 import re
-import time
+from _thread import LockType
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from threading import Lock
 
-import requests
+import httpx
 from beartype import beartype
 from beartype.typing import Any, List
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
+from loguru import logger as log
 
+from gitlab.exceptions import GitlabListError
 from gitlab.v4.objects import Group, Issue, Project, ProjectIssueNote
 
 # Regex pattern to match strings starting with 'uploads/'
 FILE_UPLOAD_PATTERN = r"uploads\/[a-zA-Z0-9\/_.-]+"
+FILE_UPLOAD_RE = re.compile(FILE_UPLOAD_PATTERN)
+
+# Regex pattern to extract the CSRF token from the meta tags of a GitLab page
+CSRF_TOKEN_PATTERN = r'<meta name="csrf-token" content="([^"]+)"'
+
+# Maximum number of concurrent attachment downloads, also the connection pool size of the client
+DOWNLOAD_WORKERS = 16
+
+# Size of the chunks attachments are streamed to disk with
+CHUNK_SIZE = 1 << 20
 
 
 @beartype
-def download_file_from_url(
-    server: str, username: str, password: str, file_urls: List[str], download_dir: str = ""
-) -> None:
-    """Downloads files from given URLs using Selenium and ChromeDriver, after logging in with provided credentials.
+def gitlab_web_session(
+    server: str, username: str | None = None, password: str | None = None, personal_access_token: str | None = None
+) -> httpx.Client:
+    """Creates a pooled HTTP/2 client for the GitLab web interface, logged in with the provided credentials.
 
     Args:
-        server (str): The base URL of the server where the files are hosted.
-        username (str): The username for login.
-        password (str): The password for login.
-        attachment_urls (List[str]): A list of URLs (relative to the server base URL) for the attachments to download.
+        server (str): The base URL of the GitLab server.
+        username (str | None, optional): The username for login. Defaults to None.
+        password (str | None, optional): The password for login. Defaults to None.
+        personal_access_token (str | None, optional): Personal access token sent with every request to the server.
+            Defaults to None.
+
+    Returns:
+        httpx.Client: The authenticated client, multiplexing downloads from the server over a shared connection.
+    """
+    transport = httpx.HTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(max_connections=DOWNLOAD_WORKERS, max_keepalive_connections=DOWNLOAD_WORKERS),
+    )
+    server_host = httpx.URL(server).host
+
+    def strip_foreign_token(request: httpx.Request) -> None:
+        # Uploads may redirect to object storage, which must not receive the token
+        if request.url.host != server_host:
+            request.headers.pop("PRIVATE-TOKEN", None)
+
+    session = httpx.Client(
+        transport=transport,
+        follow_redirects=True,
+        timeout=30.0,
+        event_hooks={"request": [strip_foreign_token]},
+    )
+
+    if personal_access_token:
+        session.headers["PRIVATE-TOKEN"] = personal_access_token
+
+    if username and password:
+        login_url = f"{server}/users/sign_in"
+        response = session.get(login_url)
+        response.raise_for_status()
+
+        csrf_token = re.search(CSRF_TOKEN_PATTERN, response.text)
+        response = session.post(
+            login_url,
+            data={
+                "authenticity_token": csrf_token.group(1) if csrf_token else "",
+                "user[login]": username,
+                "user[password]": password,
+            },
+        )
+        response.raise_for_status()
+
+        if _is_sign_in_page(response):
+            raise PermissionError(f"Login to {server} as {username} has failed.")
+
+    return session
+
+
+@beartype
+def download_file_from_url(session: httpx.Client, file_urls: List[str], download_dir: str = "") -> None:
+    """Downloads files from given URLs concurrently over an authenticated client.
+
+    Args:
+        session (httpx.Client): The authenticated client to download with.
+        file_urls (List[str]): A list of absolute URLs for the attachments to download.
         download_dir (str, optional): The directory where files should be downloaded. Defaults to the current directory.
     """
-    chrome_options = Options()
-    if download_dir:
-        # Ensure the download directory exists
-        download_dir = Path(download_dir).resolve()
-        download_dir.mkdir(parents=True, exist_ok=True)
-        # Set Chrome preferences for downloads
-        chrome_prefs = {
-            "download.default_directory": str(download_dir),
-            "download.prompt_for_download": False,  # Disable download prompt
-            "download.directory_upgrade": True,  # Enable directory upgrade
-            "safebrowsing_for_trusted_sources_enabled": False,  # Disable safe browsing for trusted sources
-            "safebrowsing.enabled": False,  # Disable safe browsing
-            "plugins.always_open_pdf_externally": True,  # Automatically download PDFs instead of opening them
-        }
-        chrome_options.add_experimental_option("prefs", chrome_prefs)
-
-    # Initialize the Chrome WebDriver
-    driver = webdriver.Chrome(service=ChromeService(ChromeDriverManager().install()), options=chrome_options)
-
-    # Perform login
-    login_url = f"{server}/users/sign_in"
-    driver.get(login_url)
-    time.sleep(2)  # Wait for the login page to load
-
-    # Fill in the login credentials and submit
-    driver.find_element(By.ID, "user_login").send_keys(username)
-    time.sleep(1)
-    driver.find_element(By.ID, "user_password").send_keys(password)
-    time.sleep(1)
-    driver.find_element(By.CLASS_NAME, "js-sign-in-button").click()
-    time.sleep(3)  # Wait for login to complete
-
-    # Download each file by navigating to its URL
-    for file_url in file_urls:
-        if file_url.endswith((".png", ".jpg", ".jpeg", ".gif", ".html")):
-            selenium_cookies = driver.get_cookies()
-            cookies = {cookie["name"]: cookie["value"] for cookie in selenium_cookies}
-
-            local_filename = file_url.split("/")[-1]
-            i = 0
-            while (download_dir / local_filename).exists():
-                i += 1
-                local_filename = Path(local_filename).stem + f"_{i}" + Path(local_filename).suffix
-
-            with requests.get(file_url, cookies=cookies, stream=True) as r:
-                r.raise_for_status()
-                with open(download_dir / local_filename, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=8192):
-                        f.write(chunk)
-
-        else:
-            driver.get(file_url)
-
-        time.sleep(2)  # Wait for each file to start downloading
-
-    # Placeholder for user to check downloads before quitting
-    driver.quit()
+    if not file_urls:
+        return
+
+    download_dir = Path(download_dir).resolve()
+    download_dir.mkdir(parents=True, exist_ok=True)
+
+    lock = Lock()
+    claimed = set()
+    with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(file_urls))) as executor:
+        futures = [
+            executor.submit(_download_file, session, file_url, download_dir, lock, claimed) for file_url in file_urls
+        ]
+        for future in futures:
+            future.result()
+
+
+@beartype
+def _download_file(session: httpx.Client, file_url: str, download_dir: Path, lock: LockType, claimed: set[str]) -> None:
+    """Downloads a single file to a unique local filename in the download directory.
+
+    A file left by a previous backup is kept instead of downloaded again if its size matches the Content-Length the
+    server reports for the URL, asked with a HEAD request before the download. The file is only moved into place once
+    it has been downloaded completely.
+
+    Args:
+        session (httpx.Client): The authenticated client to download with.
+        file_url (str): The absolute URL of the file to download.
+        download_dir (Path): The directory where the file should be downloaded.
+        lock (LockType): Lock shared by all downloads into the directory to reserve unique filenames.
+        claimed (set[str]): Filenames already taken by other downloads into the directory during this run.
+    """
+    stem, suffix = os.path.splitext(file_url.rsplit("/", 1)[-1])
+
+    try:
+        response = session.head(file_url)
+        expected_size = _get_content_length(response) if response.is_success else None
+    except httpx.HTTPError:
+        response, expected_size = None, None
+
+    if response is not None and response.is_success and _is_sign_in_page(response):
+        raise PermissionError(f"Downloading {file_url} has been redirected to the sign in page, login required.")
+
+    if expected_size is not None:
+        local_filename = _reserve_filename(download_dir, stem, suffix, expected_size, lock, claimed)
+        if local_filename is None:
+            log.debug(f"Skipping {file_url}, it is already up to date.")
+            return
+
+    with session.stream("GET", file_url) as r:
+        r.raise_for_status()
+        if _is_sign_in_page(r):
+            raise PermissionError(f"Downloading {file_url} has been redirected to the sign in page, login required.")
+
+        # Presigned object storage URLs may reject HEAD requests, so fall back to the length of the download itself
+        if expected_size is None:
+            local_filename = _reserve_filename(download_dir, stem, suffix, _get_content_length(r), lock, claimed)
+            if local_filename is None:
+                log.debug(f"Skipping {file_url}, it is already up to date.")
+                return
+
+        # Stream to a partial file first, so a failed download neither leaves a stub nor clobbers a previous backup
+        part_path = download_dir / f"{local_filename}.part"
+        try:
+            with open(part_path, "wb") as f:
+                for chunk in r.iter_bytes(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+
+            os.replace(part_path, download_dir / local_filename)
+        except BaseException:
+            part_path.unlink(missing_ok=True)
+            raise
+
+
+@beartype
+def _is_sign_in_page(response: httpx.Response) -> bool:
+    """Check whether a response has been redirected to the GitLab sign in page, i.e. is not authorized.
+
+    Args:
+        response (httpx.Response): The response to check.
+
+    Returns:
+        bool: True if the final URL of the response is the sign in page.
+    """
+    return str(response.url).rstrip("/").endswith("/users/sign_in")
+
+
+@beartype
+def _get_content_length(response: httpx.Response) -> int | None:
+    """Get the size of the file a response describes from its Content-Length header.
+
+    Args:
+        response (httpx.Response): The HEAD or GET response of the file.
+
+    Returns:
+        int | None: The size of the file in bytes, or None if it is unknown.
+    """
+    # The Content-Length of an encoded response is not the size of the decoded file on disk
+    content_length = response.headers.get("Content-Length")
+    if not content_length or "Content-Encoding" in response.headers:
+        return None
+
+    return int(content_length)
+
+
+@beartype
+def _reserve_filename(
+    download_dir: Path, stem: str, suffix: str, expected_size: int | None, lock: LockType, claimed: set[str]
+) -> str | None:
+    """Reserve a unique local filename in the download directory, or find the file of a previous backup to keep.
+
+    A file of a previous backup is kept if its size matches the expected size. If the size is unknown, the first
+    filename not taken during this run is reused and overwritten, so reruns do not pile up copies of the file.
+
+    Args:
+        download_dir (Path): The directory where the file should be downloaded.
+        stem (str): The filename without its suffix.
+        suffix (str): The suffix of the filename.
+        expected_size (int | None): The size of the file to download in bytes, if known.
+        lock (LockType): Lock shared by all downloads into the directory to reserve unique filenames.
+        claimed (set[str]): Filenames already taken by other downloads into the directory during this run.
+
+    Returns:
+        str | None: The reserved filename, or None if an existing file of the expected size is kept.
+    """
+    download_dir_str = str(download_dir)
+    with lock:
+        local_filename = stem + suffix
+        i = 0
+        while True:
+            if local_filename not in claimed:
+                local_path = os.path.join(download_dir_str, local_filename)
+                if expected_size is None or not os.path.exists(local_path):
+                    break
+
+                if os.path.getsize(local_path) == expected_size:
+                    claimed.add(local_filename)
+                    return None
+
+            i += 1
+            local_filename = f"{stem}_{i}{suffix}"
+
+        claimed.add(local_filename)
+
+    return local_filename
 
 
 @beartype
-def find_matches(obj: None | str | list | dict[str, Any], pattern: str, found: List[str] = None) -> List[str]:
+def find_matches(obj: None | str | list | dict[str, Any], pattern: re.Pattern | str) -> List[str]:
     """
-    Recursively searches for all strings in a nested JSON-like object that match a given regex pattern.
+    Iteratively searches for all strings in a nested JSON-like object that match a given regex pattern.
 
     Args:
         obj (dict[str, Any]): The JSON-like object (dict, list, or str) to search through.
-        pattern (str): The regex pattern to match strings against.
-        found (List[str], optional): Accumulator for matches found during recursion. Defaults to None.
+        pattern (re.Pattern | str): The (compiled) regex pattern to match strings against.
 
     Returns:
-        List[str]: A list of all strings found in the object that match the regex pattern.
+        List[str]: A list of all unique strings found in the object that match the regex pattern, in document order.
     """
-    if found is None:
-        found = []
+    if isinstance(pattern, str):
+        pattern = re.compile(pattern)
 
-    if isinstance(obj, dict):
-        for value in obj.values():
-            find_matches(value, pattern, found)
+    found = dict()
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            stack.extend(reversed(item.values()))
 
-    elif isinstance(obj, list):
-        for item in obj:
-            find_matches(item, pattern, found)
+        elif isinstance(item, list):
+            stack.extend(reversed(item))
 
-    elif isinstance(obj, str):
-        found += re.findall(pattern, obj)
+        elif isinstance(item, str):
+            for match in pattern.finditer(item):
+                found[match.group(0)] = None
 
-    return found
+    return list(found)
 
 
 @beartype
-def get_wiki_attachment_urls(obj: Group | Project, pattern: str) -> List[str]:
+def get_wiki_attachment_urls(obj: Group | Project, pattern: re.Pattern | str) -> List[str]:
     """Extracts attachment URLs from the "description" field of a GitLab wiki objects.
 
     Args:
         obj (Group | Project): The wiki object to extract attachment URLs from.
-        pattern (str): The regex pattern to match strings against.
+        pattern (re.Pattern | str): The (compiled) regex pattern to match strings against.
 
     Returns:
         List[str]: A list of attachment URLs extracted from the wiki contents.
     """
 
-    pages = obj.wikis.list(all=True)
-    matches = []
-    for page in pages:
-        content = obj.wikis.get(page.slug).content
-        matches += find_matches(content, pattern)
+    try:
+        pages = obj.wikis.list(all=True, with_content=True)
+    except GitlabListError:
+        pages = obj.wikis.list(all=True)
+
+    # Older GitLab versions ignore with_content, so fetch the pages returned without their content one by one
+    contents = [page.content if "content" in page.attributes else obj.wikis.get(page.slug).content for page in pages]
+    matches = find_matches([content for content in contents if content and "uploads/" in content], pattern)
 
     attachment_urls = []
     for attachment_uri in matches:
@@ -155,21 +312,22 @@ def get_wiki_attachment_urls(obj: Group | Project, pattern: str) -> List[str]:
 
 
 def get_issue_attachment_urls(
-    obj: Issue | ProjectIssueNote, pattern: str, is_note=False, web_url: str = ""
+    obj: Issue | ProjectIssueNote, pattern: re.Pattern | str, is_note=False, web_url: str = ""
 ) -> List[str]:
     """Extracts attachment URLs from the "description" field of a GitLab issue.
 
     Args:
         issue (dict[str, Any]): The issue json object to extract attachment URLs from.
-        pattern (str): The regex pattern to match strings against.
+        pattern (re.Pattern | str): The (compiled) regex pattern to match strings against.
 
     Returns:
         List[str]: A list of attachment URLs extracted from the issue description.
     """
-    if is_note:
-        matches = find_matches(obj.body, pattern)
-    else:
-        matches = find_matches(obj.description, pattern)
+    text = obj.body if is_note else obj.description
+    if not text or "uploads/" not in text:
+        return []
+
+    matches = find_matches(text, pattern)
 
     attachment_urls = []
     for attachment_uri in matches:
@@ -192,6 +350,7 @@ if __name__ == "__main__":
     SERVER = os.getenv("GITLAB_SERVER")
     USERNAME = os.getenv("GITLAB_USERNAME")
     PASSWORD = os.getenv("GITLAB_PASSWORD")
+    PERSONAL_ACCESS_TOKEN = os.getenv("GITLAB_PERSONAL_ACCESS_TOKEN")
 
     # Load the JSON data from a file
     with open("EXAMPLE_PATH_TO_ISSUE_JSON") as f:
@@ -199,7 +358,8 @@ if __name__ == "__main__":
 
     # Assuming you have a function `download_file_from_url` defined elsewhere
     # from your_module import download_file_from_url
-    attachment_urls = get_issue_attachment_urls(issue, FILE_UPLOAD_PATTERN)
+    attachment_urls = get_issue_attachment_urls(issue, FILE_UPLOAD_RE)
 
     # Assuming `SERVER`, `USERNAME`, `PASSWORD`, and `download_dir` are defined
-    download_file_from_url(SERVER, USERNAME, PASSWORD, attachment_urls, download_dir="./")
+    session = gitlab_web_session(SERVER, USERNAME, PASSWORD, PERSONAL_ACCESS_TOKEN)
+    download_file_from_url(session, attachment_urls, download_dir="./")
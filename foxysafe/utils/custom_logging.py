@@ -1,4 +1,5 @@
 import logging
+import sys
 
 from beartype import beartype
 from hydra.core.hydra_config import HydraConfig
@@ -6,6 +7,11 @@ from loguru import logger as log
 from omegaconf import DictConfig
 from rich.logging import RichHandler
 
+# Loguru level for each standard logging level name, resolved once per name
+_LEVEL_CACHE: dict[str, str | int] = {}
+
+LOGGING_FILE = logging.__file__
+
 
 @beartype
 class InterceptHandler(logging.Handler):
@@ -18,15 +24,16 @@ class InterceptHandler(logging.Handler):
             record (logging.LogRecord): Basic log record.
         """
 
-        try:
-            level = log.level(record.levelname).name
-        except ValueError:
-            level = record.levelno
-
-        import sys
+        level = _LEVEL_CACHE.get(record.levelname)
+        if level is None:
+            try:
+                level = log.level(record.levelname).name
+            except ValueError:
+                level = record.levelno
+            _LEVEL_CACHE[record.levelname] = level
 
         frame, depth = sys._getframe(6), 6
-        while frame and frame.f_code.co_filename == logging.__file__:
+        while frame and frame.f_code.co_filename == LOGGING_FILE:
             frame = frame.f_back
             depth += 1
 